@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+# O google.generativeai (grpc/protobuf) só é importado na primeira chamada ou no aquecimento
+_lock = threading.Lock()
+_genai = None
+_models = {}
+
+
+def _load_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=get_config().gemini_api_key)
+        _genai = genai
+    return _genai
+
+def get_model(model_name: str = DEFAULT_MODEL):
+    """Retorna o modelo do Gemini, inicializando o cliente na primeira vez."""
+    model = _models.get(model_name)
+    if model is None:
+        with _lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = _load_genai().GenerativeModel(model_name)
+                _models[model_name] = model
+    return model
+
+async def get_model_async(model_name: str = DEFAULT_MODEL):
+    """Como `get_model`, mas sem bloquear o event loop durante a inicialização."""
+    model = _models.get(model_name)
+    if model is None:
+        model = await asyncio.to_thread(get_model, model_name)
+    return model
+
+async def warm_up(model_name: str = DEFAULT_MODEL):
+    """Inicializa o cliente em segundo plano, depois que o polling já começou."""
+    try:
+        await get_model_async(model_name)
+        logger.info("Cliente do Gemini inicializado.")
+    except Exception as e:
+        logger.error("Erro ao inicializar o cliente do Gemini: %s", e)
+
+# --- Roteamento por modo e idioma ---
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Modelo e parâmetros de geração usados para um modo."""
+    model_name: str = DEFAULT_MODEL
+    max_output_tokens: int | None = None
+    temperature: float | None = None
+    timeout: float = 30.0 # segundos
+
+    def generation_config(self) -> dict:
+        config = {}
+        if self.max_output_tokens is not None:
+            config['max_output_tokens'] = self.max_output_tokens
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        return config
+
+# Rotas por (modo, idioma). Idioma None vale para qualquer idioma sem rota própria.
+MODEL_ROUTES = {
+    ('diagnose', None): ModelRoute(max_output_tokens=700, temperature=0.7, timeout=30.0),
+    ('improve', None): ModelRoute(max_output_tokens=400, temperature=0.6, timeout=20.0),
+    ('affirmation', None): ModelRoute(max_output_tokens=250, temperature=0.9, timeout=15.0),
+}
+DEFAULT_ROUTE = ModelRoute()
+
+# Configurações candidatas, executadas em sombra numa amostra do tráfego (SHADOW_SAMPLE_RATE).
+# A resposta em sombra nunca é enviada ao usuário; só latência e tamanho são comparados.
+SHADOW_ROUTES = {
+    ('affirmation', None): ModelRoute(model_name='gemini-1.5-flash-8b', max_output_tokens=200, temperature=0.9, timeout=15.0),
+    ('improve', None): ModelRoute(model_name='gemini-1.5-flash-8b', max_output_tokens=400, temperature=0.6, timeout=20.0),
+}
+MAX_SHADOW_IN_FLIGHT = 4
+
+shadow_stats = {} # (modo, modelo candidato) -> métricas acumuladas
+_shadow_tasks = set()
+
+def _lookup(routes: dict, mode: str, lang: str | None):
+    return routes.get((mode, lang)) or routes.get((mode, None))
+
+def get_route(mode: str, lang: str | None = None) -> ModelRoute:
+    return _lookup(MODEL_ROUTES, mode, lang) or DEFAULT_ROUTE
+
+async def _call(route: ModelRoute, prompt: str):
+    model = await get_model_async(route.model_name)
+    return await asyncio.wait_for(
+        model.generate_content_async(prompt, generation_config=route.generation_config()),
+        timeout=route.timeout
+    )
+
+async def generate(prompt: str, mode: str, lang: str | None = None):
+    """Gera o conteúdo com a rota do modo/idioma e, por amostragem, dispara a rota candidata em sombra."""
+    route = get_route(mode, lang)
+    started = time.monotonic()
+    response = await _call(route, prompt)
+    latency = time.monotonic() - started
+
+    candidate = _lookup(SHADOW_ROUTES, mode, lang)
+    if (candidate and len(_shadow_tasks) < MAX_SHADOW_IN_FLIGHT
+            and random.random() < get_config().shadow_sample_rate):
+        task = asyncio.create_task(_shadow(candidate, prompt, mode, latency, len(response.text)))
+        _shadow_tasks.add(task)
+        task.add_done_callback(_shadow_tasks.discard)
+    return response
+
+async def _shadow(route: ModelRoute, prompt: str, mode: str, primary_latency: float, primary_chars: int):
+    stats = shadow_stats.setdefault((mode, route.model_name), {
+        'samples': 0, 'errors': 0,
+        'primary_latency': 0.0, 'shadow_latency': 0.0,
+        'primary_chars': 0, 'shadow_chars': 0,
+    })
+    started = time.monotonic()
+    try:
+        response = await _call(route, prompt)
+        shadow_chars = len(response.text)
+    except Exception as e:
+        stats['errors'] += 1
+        logger.warning("Falha na chamada em sombra (%s, %s): %s", mode, route.model_name, e)
+        return
+    shadow_latency = time.monotonic() - started
+
+    stats['samples'] += 1
+    stats['primary_latency'] += primary_latency
+    stats['shadow_latency'] += shadow_latency
+    stats['primary_chars'] += primary_chars
+    stats['shadow_chars'] += shadow_chars
+    samples = stats['samples']
+    logger.info(
+        "Sombra %s/%s: %.2fs e %d caracteres (principal: %.2fs e %d). Médias em %d amostras: %.2fs vs %.2fs, %d vs %d caracteres.",
+        mode, route.model_name, shadow_latency, shadow_chars, primary_latency, primary_chars, samples,
+        stats['shadow_latency'] / samples, stats['primary_latency'] / samples,
+        stats['shadow_chars'] // samples, stats['primary_chars'] // samples
+    )
@@ -23,24 +23,27 @@ def get_analytics():
         active_users_last_week = cursor.fetchone()[0]
         print(f"[+] Usuários Ativos na Última Semana: {active_users_last_week}")
 
-        # 3. Frequência de uso por usuário
+        # 3. Frequência de uso por usuário (inclui interações já arquivadas)
         print("\n--- Frequência de Uso por Usuário (Total de Interações) ---")
         cursor.execute("""
-            SELECT p.name, u.user_id, COUNT(i.interaction_id)
+            SELECT p.name, u.user_id, COUNT(i.interaction_id) + COALESCE(a.interactions, 0) AS total
             FROM users u
             JOIN user_profiles p ON u.user_id = p.user_id
             LEFT JOIN interactions i ON u.user_id = i.user_id
+            LEFT JOIN archived_counters a ON u.user_id = a.user_id
             GROUP BY u.user_id
-            ORDER BY COUNT(i.interaction_id) DESC
+            ORDER BY total DESC
         """)
-        
-        user_frequency = cursor.fetchall()
 
-        if not user_frequency:
-            print("Nenhuma interação registrada ainda.")
-        else:
-            for name, user_id, count in user_frequency:
+        # Percorre o cursor em lotes em vez de carregar todo o resultado na memória
+        printed = 0
+        while rows := cursor.fetchmany(500):
+            for name, user_id, count in rows:
                 print(f"- {name} (ID: {user_id}): {count} interações")
+            printed += len(rows)
+
+        if not printed:
+            print("Nenhuma interação registrada ainda.")
 
         conn.close()
 
@@ -0,0 +1,141 @@
+"""
+Mede vazão e latência de cauda dos envios à Bot API conforme a concorrência cresce,
+contra um servidor falso local (nenhuma mensagem real é enviada).
+
+Uso: python bench_http.py [--pools 1,8,256] [--concurrency 1,4,16,64,256] [--requests 1000] [--latency-ms 30]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import telegram_http
+from config import get_config
+
+FAKE_TOKEN = "123456:bench"
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class FakeBotAPI:
+    """Servidor HTTP/1.1 mínimo (keep-alive) que responde getMe e sendMessage após `latency` segundos."""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self._message_id = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        # Fecha as conexões keep-alive ociosas para que os handlers terminem antes do fim do loop
+        for writer in list(self._writers):
+            writer.transport.abort()
+        await self._server.wait_closed()
+        await asyncio.sleep(0)
+
+    def _result(self, path: str) -> dict:
+        if path.endswith("/getMe"):
+            return BOT_USER
+        self._message_id += 1
+        return {'message_id': self._message_id, 'date': int(time.time()), 'chat': {'id': 1, 'type': 'private'}, 'text': "ok"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.split()[1].decode()
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode('latin-1').partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                body = json.dumps({'ok': True, 'result': self._result(path)}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_level(port: int, pool_size: int, concurrency: int, total: int) -> dict:
+    """Dispara `total` send_message com no máximo `concurrency` em paralelo, num pool de `pool_size` conexões."""
+    from telegram import Bot
+
+    config = get_config()
+    request = telegram_http.build_request(
+        pool_size, config.http_keepalive_connections, config.http_keepalive_expiry, "1.1",
+        config.http_connect_timeout, config.http_read_timeout, config.http_write_timeout,
+        pool_timeout=60.0, # No benchmark a fila por conexão vira latência, não erro
+    )
+    bot = Bot(FAKE_TOKEN, base_url=f"http://127.0.0.1:{port}/bot", request=request)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def send(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await bot.send_message(chat_id=1, text=f"mensagem {index}")
+            latencies.append(time.perf_counter() - started)
+
+    async with bot:
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return {
+        'throughput': total / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+async def main_async(pools: list[int], levels: list[int], total: int, latency: float):
+    server = FakeBotAPI(latency)
+    port = await server.start()
+    print(f"--- Servidor falso da Bot API em 127.0.0.1:{port} (latência {latency * 1000:.0f} ms) ---")
+    print(f"{'pool':>5} {'concorrência':>13} {'envios/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'conexões':>9}")
+    try:
+        for pool_size in pools:
+            for concurrency in levels:
+                connections_before = server.connections
+                result = await run_level(port, pool_size, concurrency, total)
+                print(f"{pool_size:>5} {concurrency:>13} {result['throughput']:>10.1f} {result['p50_ms']:>10.1f} "
+                      f"{result['p99_ms']:>10.1f} {server.connections - connections_before:>9}")
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", default=f"1,8,{get_config().http_pool_size}",
+                        help="Tamanhos de pool a comparar (o último padrão é HTTP_POOL_SIZE).")
+    parser.add_argument("--concurrency", default="1,4,16,64,256")
+    parser.add_argument("--requests", type=int, default=1000, help="Envios por combinação.")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Latência simulada da Bot API.")
+    args = parser.parse_args()
+    pools = [int(value) for value in args.pools.split(",")]
+    levels = [int(value) for value in args.concurrency.split(",")]
+    asyncio.run(main_async(pools, levels, args.requests, args.latency_ms / 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Mede o custo de importação do bot em um interpretador limpo.
+
+Uso: python bench_startup.py [--runs 10] [--module bot] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def time_import(module: str, env: dict) -> float:
+    """Tempo total (s) de um processo Python que apenas importa o módulo."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], env=env, check=True)
+    return time.perf_counter() - started
+
+def slowest_imports(module: str, env: dict, top: int) -> list[tuple[int, str]]:
+    """Módulos com maior tempo cumulativo de importação (em microssegundos), via -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="bot")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # Chaves fictícias: importar o módulo não deve depender delas
+    env = {**os.environ, "TELEGRAM_TOKEN": os.getenv("TELEGRAM_TOKEN", "bench"), "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "bench")}
+    baseline = [time_import("sys", env) for _ in range(args.runs)]
+    samples = [time_import(args.module, env) for _ in range(args.runs)]
+
+    print(f"--- Importação de '{args.module}' ({args.runs} execuções) ---")
+    print(f"[+] Interpretador vazio: mediana {statistics.median(baseline) * 1000:.1f} ms")
+    print(f"[+] Com '{args.module}': mediana {statistics.median(samples) * 1000:.1f} ms, "
+          f"máx {max(samples) * 1000:.1f} ms")
+    print(f"[+] Custo do módulo: {(statistics.median(samples) - statistics.median(baseline)) * 1000:.1f} ms")
+
+    print(f"\n--- {args.top} importações mais lentas (cumulativo) ---")
+    for cumulative, name in slowest_imports(args.module, env, args.top):
+        print(f"- {name}: {cumulative / 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+@dataclass(frozen=True)
+class Config:
+    """Configuração do bot, lida das variáveis de ambiente (e do arquivo .env)."""
+    telegram_token: str | None
+    gemini_api_key: str | None
+    community_link: str
+    db_file: str = "trader_bot.db"
+    archive_dir: str = "archive" # Arquivos anuais de retention.py
+    retention_days: int = 180 # Idade a partir da qual interações e trades vão para o arquivo
+    tenants_file: str | None = None # JSON com várias comunidades num só processo (ver tenants.py)
+    max_interactions_per_day: int = 10
+    keep_alive_port: int = 8080
+    drain_timeout: float = 25.0 # Segundos para concluir respostas em andamento ao receber SIGTERM
+    speculative_focus: bool = False
+    speculative_max_concurrency: int = 2
+    shadow_sample_rate: float = 0.0
+    log_level: str = "INFO"
+    log_sample_rate: float = 1.0 # Fração das linhas INFO de alto volume que são gravadas
+    # Cliente HTTP da Bot API (ver telegram_http.py); os tempos são em segundos
+    http_pool_size: int = 256 # Mesmo pool de envios do ApplicationBuilder do python-telegram-bot
+    http_keepalive_connections: int | None = None # None = todas as conexões do pool
+    http_keepalive_expiry: float = 30.0
+    http_version: str = "1.1"
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 10.0
+    http_write_timeout: float = 10.0
+    http_pool_timeout: float = 5.0 # Espera máxima por uma conexão livre no pool
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        load_dotenv()
+        return cls(
+            telegram_token=os.getenv("TELEGRAM_TOKEN"),
+            gemini_api_key=os.getenv("GEMINI_API_KEY"),
+            community_link=os.getenv("COMMUNITY_LINK", "https://t.me/unitytradersoficialsmc"),
+            db_file=os.getenv("DB_FILE", "trader_bot.db"),
+            archive_dir=os.getenv("ARCHIVE_DIR", "archive"),
+            retention_days=int(os.getenv("RETENTION_DAYS", "180")),
+            tenants_file=os.getenv("TENANTS_FILE") or None,
+            max_interactions_per_day=int(os.getenv("MAX_INTERACTIONS_PER_DAY", "10")),
+            keep_alive_port=int(os.getenv("PORT", "8080")),
+            drain_timeout=float(os.getenv("DRAIN_TIMEOUT", "25")),
+            speculative_focus=_env_flag("SPECULATIVE_FOCUS"),
+            speculative_max_concurrency=int(os.getenv("SPECULATIVE_MAX_CONCURRENCY", "2")),
+            shadow_sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0")),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1")),
+            http_pool_size=int(os.getenv("HTTP_POOL_SIZE", "256")),
+            http_keepalive_connections=int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS")) if os.getenv("HTTP_KEEPALIVE_CONNECTIONS") else None,
+            http_keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+            http_version=os.getenv("HTTP_VERSION", "1.1"),
+            http_connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+            http_read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "10")),
+            http_write_timeout=float(os.getenv("HTTP_WRITE_TIMEOUT", "10")),
+            http_pool_timeout=float(os.getenv("HTTP_POOL_TIMEOUT", "5")),
+        )
+
+    def missing_keys(self) -> list[str]:
+        """Lista as chaves obrigatórias que não foram definidas."""
+        missing = []
+        if not self.telegram_token:
+            missing.append("TELEGRAM_TOKEN")
+        if not self.gemini_api_key:
+            missing.append("GEMINI_API_KEY")
+        return missing
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    return Config.from_env()
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANGUAGE = 'pt'
+
+
+class Template:
+    """Texto traduzido com os campos de formatação já identificados."""
+    __slots__ = ('text', 'fields')
+
+    def __init__(self, text: str):
+        self.text = sys.intern(text)
+        self.fields = frozenset(sys.intern(name) for _, name, _, _ in Formatter().parse(text) if name)
+
+    def render(self, kwargs: dict) -> str:
+        if not self.fields:
+            return self.text
+        return self.text.format(**kwargs)
+
+
+# Catálogos carregados sob demanda: idioma -> {chave: Template}
+_catalogs: dict[str, dict[str, Template]] = {}
+_load_times: dict[str, float] = {}
+_lock = threading.Lock()
+_reported_missing: set[tuple[str, str]] = set()
+
+def available_languages() -> list[str]:
+    """Idiomas com arquivo em locales/, sem carregá-los."""
+    return sorted(name[:-len(".json")] for name in os.listdir(LOCALES_DIR) if name.endswith(".json"))
+
+def load_language(lang: str) -> dict[str, Template] | None:
+    """Carrega (uma única vez) o catálogo de um idioma. Retorna None se o idioma não existir."""
+    catalog = _catalogs.get(lang)
+    if catalog is not None:
+        return catalog
+    path = os.path.join(LOCALES_DIR, f"{lang}.json")
+    if not os.path.isfile(path):
+        return None
+    with _lock:
+        if lang not in _catalogs:
+            started = time.perf_counter()
+            with open(path, encoding='utf-8') as f:
+                raw = json.load(f)
+            _catalogs[lang] = {sys.intern(key): Template(text) for key, text in raw.items()}
+            _load_times[lang] = time.perf_counter() - started
+            logger.info("Idioma '%s' carregado: %d textos em %.1f ms.", lang, len(raw), _load_times[lang] * 1000)
+    return _catalogs[lang]
+
+def get_text(key, lang='pt', **kwargs):
+    """Busca um texto traduzido, com o idioma padrão como alternativa."""
+    catalog = load_language(lang) or load_language(DEFAULT_LANGUAGE)
+    template = catalog.get(key)
+    if template is None:
+        template = load_language(DEFAULT_LANGUAGE).get(key)
+        if (lang, key) not in _reported_missing:
+            _reported_missing.add((lang, key))
+            logger.warning("Texto '%s' sem tradução para '%s'.", key, lang)
+        if template is None:
+            return key.format(**kwargs)
+    return template.render(kwargs)
+
+def missing_keys(lang: str) -> set[str]:
+    """Chaves do idioma padrão que faltam no idioma informado."""
+    return set(load_language(DEFAULT_LANGUAGE)) - set(load_language(lang) or {})
+
+def field_mismatches(lang: str) -> dict[str, tuple[frozenset, frozenset]]:
+    """Chaves cujos campos de formatação diferem do idioma padrão."""
+    default = load_language(DEFAULT_LANGUAGE)
+    catalog = load_language(lang) or {}
+    return {
+        key: (default[key].fields, template.fields)
+        for key, template in catalog.items()
+        if key in default and template.fields != default[key].fields
+    }
+
+def report():
+    """Imprime o custo de carregamento e as traduções incompletas de cada idioma."""
+    print("--- Relatório dos Catálogos de Idiomas ---")
+    for lang in available_languages():
+        catalog = load_language(lang)
+        print(f"\n[{lang}] {len(catalog)} textos, carregado em {_load_times[lang] * 1000:.2f} ms")
+        for key in sorted(missing_keys(lang)):
+            print(f"  - Sem tradução: {key}")
+        for key, (expected, found) in sorted(field_mismatches(lang).items()):
+            print(f"  - Campos divergentes em '{key}': esperado {sorted(expected)}, encontrado {sorted(found)}")
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass
+
+import tenants
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateTurn(Exception):
+    """O mesmo pedido já está sendo respondido por outro update do usuário."""
+
+class StaleTurn(Exception):
+    """O pedido foi cancelado porque o usuário seguiu para outro comando."""
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    replies: bool # Quem iniciou a chamada vai responder ao usuário (False para geração em segundo plano)
+    waiters: int = 0
+
+
+class InFlightRegistry:
+    """
+    Chamadas à IA em andamento, por usuário e por chave do pedido.
+    Pedidos idênticos e simultâneos aguardam a mesma chamada em vez de gerar outra.
+    O mesmo user_id do Telegram em comunidades diferentes é tratado como outro usuário.
+    """
+    def __init__(self):
+        self._calls: dict[tuple[str, int], dict[str, _Call]] = {}
+        self.stats = {'started': 0, 'joined': 0, 'duplicates': 0, 'cancelled': 0}
+
+    async def run(self, user_id: int, key: str, factory, replies: bool = True):
+        """
+        Executa `factory()` ou se junta à chamada idêntica já em andamento.
+        Se as duas chamadas responderiam ao usuário, a segunda termina com DuplicateTurn
+        (depois da primeira), evitando a resposta repetida.
+        """
+        owner = self._owner(user_id)
+        calls = self._calls.setdefault(owner, {})
+        call = calls.get(key)
+        duplicate = False
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()), replies)
+            calls[key] = call
+            call.task.add_done_callback(functools.partial(self._forget, owner, key))
+            self.stats['started'] += 1
+        else:
+            self.stats['joined'] += 1
+            duplicate = replies and call.replies
+            call.replies = call.replies or replies
+
+        call.waiters += 1
+        try:
+            # shield: cancelar quem espera não cancela a chamada enquanto outro ainda espera por ela
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.task.cancelled() and not asyncio.current_task().cancelling():
+                raise StaleTurn() from None
+            raise
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # O último interessado desistiu (ex: plano especulativo descartado): não gasta os tokens
+                call.task.cancel()
+                self.stats['cancelled'] += 1
+        if duplicate:
+            self.stats['duplicates'] += 1
+            raise DuplicateTurn()
+        return result
+
+    @staticmethod
+    def _owner(user_id: int) -> tuple[str, int]:
+        return tenants.active().name, user_id
+
+    def cancel_stale(self, user_id: int) -> int:
+        """Cancela as chamadas pendentes de um usuário (na comunidade ativa) que mudou de assunto."""
+        return self._cancel(self._owner(user_id))
+
+    def cancel_all(self) -> int:
+        """Cancela as chamadas pendentes de todos os usuários (encerramento do bot)."""
+        return sum(self._cancel(owner) for owner in list(self._calls))
+
+    def _cancel(self, owner: tuple[str, int]) -> int:
+        cancelled = 0
+        for call in self._calls.pop(owner, {}).values():
+            if not call.task.done():
+                call.task.cancel()
+                cancelled += 1
+        if cancelled:
+            self.stats['cancelled'] += cancelled
+            logger.info("%d chamada(s) pendente(s) do usuário %s (%s) cancelada(s).", cancelled, owner[1], owner[0])
+        return cancelled
+
+    def _forget(self, owner: tuple[str, int], key: str, task: asyncio.Task):
+        calls = self._calls.get(owner)
+        if calls and calls.get(key) is not None and calls[key].task is task:
+            del calls[key]
+            if not calls:
+                del self._calls[owner]
+
+
+registry = InFlightRegistry()
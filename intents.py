@@ -0,0 +1,246 @@
+import re
+import time
+import unicodedata
+
+# Padrões por intenção (pt, en, es juntos), escritos sem acentos: o texto é normalizado antes da busca.
+# Cada padrão só casa com palavras inteiras ("no" não casa com "nossa" nem com "know").
+INTENT_PATTERNS = {
+    'yes': [
+        r"sim", r"claro", r"com certeza", r"isso", r"exato", r"faz sentido", r"pode ser",      # pt
+        r"yes", r"yeah", r"yep", r"yup", r"sure", r"of course", r"makes sense", r"ok(ay)?",    # en
+        r"si", r"por supuesto", r"tiene sentido", r"vale", r"dale",                                 # es
+    ],
+    'no': [
+        r"nao", r"nem", r"negativo", r"nunca",                                                # pt
+        r"no", r"nope", r"nah", r"not", r"never", r"don ?t", r"doesn ?t",                           # en
+        r"tampoco", r"para nada",                                                                   # es
+    ],
+}
+
+# Respostas a "está satisfeito com sua performance?" (/perfil).
+# A negação só conta quando ligada à palavra de satisfação: "não tenho do que reclamar" não é insatisfação.
+SATISFACTION_PATTERNS = {
+    'dissatisfied': [
+        r"nao (?:estou |to |fiquei |me sinto )?(?:muito |totalmente |tao |completamente )?satisfeit[oa]",
+        r"insatisfeit[oa]", r"nao muito", r"nem tanto", r"mais ou menos",                           # pt
+        r"not (?:really |fully |completely |very |that |so )?(?:satisfied|happy)", r"not really", r"not quite",
+        r"unsatisfied", r"dissatisfied", r"more or less",                                           # en
+        r"no (?:estoy |me siento )?(?:muy |totalmente |tan |del todo )?satisfech[oa]",
+        r"insatisfech[oa]", r"no mucho", r"mas o menos",                                            # es
+    ],
+    'satisfied': [
+        r"satisfeit[oa]", r"satisfied", r"satisfech[oa]",
+    ],
+    # Sinais mais soltos de que o trader quer ir além; só valem sem uma satisfação declarada
+    'wants_more': [
+        r"poderia", r"podia", r"alem", r"mais longe", r"quero mais",                                # pt
+        r"could", r"further", r"(?:do|be|achieve|get|want) more", r"better",                        # en
+        r"podria", r"mas lejos", r"quiero mas",                                                     # es
+    ],
+}
+_BARE_NEGATIVES = frozenset({'nao', 'no', 'not', 'nope', 'nah'})
+
+# Respostas a "que ações você tomou fora do plano?" (/postrade)
+PLAN_PATTERNS = {
+    'deviated': [
+        r"nao (?:segui|respeitei|cumpri)", r"fora do plano", r"(?:sai|fugi|desviei) do plano",
+        r"quebrei (?:o |meu )?plano", r"desviei",                                                   # pt
+        r"did ?n ?t (?:follow|stick to|respect)", r"(?:off|outside) (?:the |my )?plan",
+        r"broke (?:the |my )?plan", r"deviated",                                                    # en
+        r"no (?:segui|respete|cumpli)", r"fuera del plan", r"me sali del plan",                     # es
+    ],
+    'followed': [
+        r"nao", r"nenhuma?", r"nada", r"(?:nao|nem) (?:fiz|tive|houve|teve)",
+        r"(?:sem|nada|nenhuma?) (?:\w+ ){0,3}fora do plano", r"segui (?:o |meu )?plano", r"segui (?:tudo|a risca)",
+        r"a risca", r"conforme (?:o )?plano", r"dentro do plano", r"como planejado",                # pt
+        r"no", r"none", r"nothing", r"nope", r"followed (?:the |my )?plan", r"stuck to (?:the |my )?plan",
+        r"as planned", r"by the book", r"(?:no|nothing|none) (?:\w+ ){0,3}outside (?:the |my )?plan",   # en
+        r"ningun[oa]?", r"segui (?:el |mi )?plan", r"conforme al plan", r"segun (?:el |lo )?plan(?:eado)?",
+        r"(?:sin|nada|ningun[oa]?) (?:\w+ ){0,3}fuera del plan",                                     # es
+    ],
+}
+
+def _compile(intent_patterns: dict[str, list[str]]):
+    """
+    Junta todos os padrões num único autômato (alternância de grupos nomeados), compilado uma vez.
+    Um padrão presente em várias intenções (ex: "nao") vira um só grupo associado a todas elas.
+    Os padrões mais longos vêm primeiro: numa mesma posição, "nao segui" tem precedência sobre "nao".
+    """
+    pattern_intents = {}
+    for intent, patterns in intent_patterns.items():
+        for pattern in patterns:
+            pattern_intents.setdefault(pattern, set()).add(intent)
+    group_intents = {}
+    alternatives = []
+    ordered = sorted(pattern_intents.items(), key=lambda item: len(item[0]), reverse=True)
+    for index, (pattern, pattern_set) in enumerate(ordered):
+        group_intents[f"g{index}"] = frozenset(pattern_set)
+        alternatives.append(rf"(?P<g{index}>{pattern})")
+    return re.compile(rf"\b(?:{'|'.join(alternatives)})\b"), group_intents
+
+_MATCHER, _GROUP_INTENTS = _compile(INTENT_PATTERNS)
+_PLAN_MATCHER, _PLAN_GROUP_INTENTS = _compile(PLAN_PATTERNS)
+_SATISFACTION_MATCHER, _SATISFACTION_GROUP_INTENTS = _compile(SATISFACTION_PATTERNS)
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação (apóstrofos viram espaço)."""
+    text = text.lower()
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _PUNCTUATION.sub(" ", text)
+
+def _find(matcher: re.Pattern, group_intents: dict, text: str | None) -> set[str]:
+    if not text:
+        return set()
+    found = set()
+    for match in matcher.finditer(normalize(text)):
+        found |= group_intents[match.lastgroup]
+    return found
+
+def find_intents(text: str | None) -> set[str]:
+    """Todas as intenções presentes no texto."""
+    return _find(_MATCHER, _GROUP_INTENTS, text)
+
+def is_affirmative(text: str | None) -> bool:
+    """'sim'/'yes'/'sí' sem negação na mesma resposta. Na dúvida, não confirma."""
+    intents = find_intents(text)
+    return 'yes' in intents and 'no' not in intents
+
+# Confirmações explícitas: o bot pede "responda 'sim'" antes de ações como apagar o perfil
+STRICT_YES = frozenset({'sim', 'yes', 'si'})
+
+def is_confirmation(text: str | None) -> bool:
+    """
+    A resposta começa com sim/yes/sí e não é uma pergunta. Sinônimos ("isso", "ok", "vale")
+    ficam de fora: "Isso apaga tudo?" não pode confirmar a exclusão do perfil.
+    """
+    if not text or text.rstrip().endswith("?"):
+        return False
+    words = normalize(text).split()
+    return bool(words) and words[0] in STRICT_YES
+
+def is_negative(text: str | None) -> bool:
+    return 'no' in find_intents(text)
+
+def is_dissatisfied(text: str | None) -> bool:
+    """
+    Insatisfação explícita ("não estou satisfeito", "insatisfeito") ou um "não" seco decidem;
+    uma satisfação declarada vem antes dos sinais soltos ("poderia", "further").
+    """
+    found = _find(_SATISFACTION_MATCHER, _SATISFACTION_GROUP_INTENTS, text)
+    if 'dissatisfied' in found:
+        return True
+    if 'satisfied' in found:
+        return False
+    words = normalize(text or "").split()
+    if words and all(word in _BARE_NEGATIVES for word in words):
+        return True
+    return 'wants_more' in found
+
+def has_unplanned_actions(text: str | None) -> bool:
+    """
+    Houve ação fora do plano? Um desvio explícito ("não segui o plano") sempre conta;
+    uma negativa ou "segui o plano" indica que não; qualquer outra descrição é tratada como ação.
+    """
+    if not text or not text.strip():
+        return False
+    found = _find(_PLAN_MATCHER, _PLAN_GROUP_INTENTS, text)
+    return 'deviated' in found or 'followed' not in found
+
+
+# Corpus de verificação: (texto, função, resultado esperado)
+INTENT_CORPUS = [
+    ("sim", is_affirmative, True),
+    ("Sim!", is_affirmative, True),
+    ("SIM, faz sentido", is_affirmative, True),
+    ("yes", is_affirmative, True),
+    ("Yes, it does", is_affirmative, True),
+    ("sí", is_affirmative, True),
+    ("Si, claro", is_affirmative, True),
+    ("ok", is_affirmative, True),
+    ("não", is_affirmative, False),
+    ("nao sei", is_affirmative, False),
+    ("no", is_affirmative, False),
+    ("sim, mas não", is_affirmative, False),
+    ("simples demais", is_affirmative, False),
+    ("yesterday was bad", is_affirmative, False),
+    ("assim não", is_affirmative, False),
+    ("siempre", is_affirmative, False),
+    ("nossa, sim", is_affirmative, True),
+    ("I know, yes", is_affirmative, True),
+    ("I don't think so", is_negative, True),
+    ("It's fine", is_affirmative, False),
+    ("não, obrigado", is_negative, True),
+    ("sim", is_confirmation, True),
+    ("Sí", is_confirmation, True),
+    ("Yes, reset it", is_confirmation, True),
+    ("Sim, não tenho dúvidas", is_confirmation, True),
+    ("Isso apaga tudo?", is_confirmation, False),
+    ("O que isso significa?", is_confirmation, False),
+    ("Sim?", is_confirmation, False),
+    ("ok", is_confirmation, False),
+    ("Pode ser", is_confirmation, False),
+    ("Vale", is_confirmation, False),
+    ("Não, sim... espera", is_confirmation, False),
+    ("Não estou satisfeito", is_dissatisfied, True),
+    ("Poderia ir muito além", is_dissatisfied, True),
+    ("I could do much better", is_dissatisfied, True),
+    ("No, I'm not satisfied", is_dissatisfied, True),
+    ("Podría llegar más lejos", is_dissatisfied, True),
+    ("Estoy insatisfecho", is_dissatisfied, True),
+    ("Estou satisfeito", is_dissatisfied, False),
+    ("Nossa, estou muito satisfeito", is_dissatisfied, False),
+    ("I know I'm doing great", is_dissatisfied, False),
+    ("Estoy satisfecho", is_dissatisfied, False),
+    ("Sim, estou feliz com a minha evolução", is_dissatisfied, False),
+    ("I am satisfied, no complaints", is_dissatisfied, False),
+    ("Não tenho do que reclamar, estou satisfeito", is_dissatisfied, False),
+    ("Não tenho do que reclamar", is_dissatisfied, False),
+    ("Não", is_dissatisfied, True),
+    ("Not really", is_dissatisfied, True),
+    ("Não muito, sei que posso mais", is_dissatisfied, True),
+    ("No estoy satisfecho", is_dissatisfied, True),
+    ("I'm not really satisfied", is_dissatisfied, True),
+    ("Faz sentido, sim", is_affirmative, True),
+    ("Claro que sim", is_affirmative, True),
+    ("Tiene sentido, sí", is_affirmative, True),
+    ("Of course, yes", is_affirmative, True),
+    ("Segui o plano à risca", has_unplanned_actions, False),
+    ("Sem ações fora do plano", has_unplanned_actions, False),
+    ("Fiz tudo conforme o plano", has_unplanned_actions, False),
+    ("I followed my plan", has_unplanned_actions, False),
+    ("Nenhuma", has_unplanned_actions, False),
+    ("Não", has_unplanned_actions, False),
+    ("Ninguna", has_unplanned_actions, False),
+    ("Não segui o plano", has_unplanned_actions, True),
+    ("Não, entrei fora do plano", has_unplanned_actions, True),
+    ("I didn't follow my plan", has_unplanned_actions, True),
+    ("No seguí el plan", has_unplanned_actions, True),
+    ("Aumentei a mão depois do stop", has_unplanned_actions, True),
+]
+
+def check_corpus() -> list[tuple[str, str, bool]]:
+    """Casos do corpus classificados de forma errada."""
+    return [
+        (text, function.__name__, expected)
+        for text, function, expected in INTENT_CORPUS
+        if function(text) != expected
+    ]
+
+def benchmark(iterations: int = 20000) -> float:
+    """Tempo médio (µs) de uma classificação sobre o corpus."""
+    texts = [text for text, _, _ in INTENT_CORPUS]
+    started = time.perf_counter()
+    for i in range(iterations):
+        find_intents(texts[i % len(texts)])
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+if __name__ == "__main__":
+    failures = check_corpus()
+    print(f"--- Corpus de intenções: {len(INTENT_CORPUS) - len(failures)}/{len(INTENT_CORPUS)} corretos ---")
+    for text, function_name, expected in failures:
+        print(f"- {function_name}({text!r}) deveria ser {expected}")
+    print(f"[+] Classificação: {benchmark():.2f} µs por resposta")
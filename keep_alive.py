@@ -1,15 +1,61 @@
-from flask import Flask
-from threading import Thread
+import logging
+from threading import Event, Thread
 
-app = Flask('')
+logger = logging.getLogger(__name__)
 
-@app.route('/')
-def home():
-    return "O mentor está vivo."
+def create_app(is_ready=None, metrics=None):
+    # Flask só é importado na thread do servidor, fora do caminho de inicialização do bot
+    from flask import Flask
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+    app = Flask('')
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+    @app.route('/')
+    def home():
+        return "O mentor está vivo."
+
+    @app.route('/ready')
+    def ready():
+        # 503 enquanto o bot inicia ou drena para encerrar: o orquestrador não deve contar com esta instância
+        if is_ready is None or is_ready():
+            return "pronto"
+        return "indisponível", 503
+
+    @app.route('/metrics')
+    def metrics_route():
+        # Contadores por comunidade (updates, chamadas à IA, tokens, cota)
+        return metrics() if metrics else {}
+
+    return app
+
+class KeepAliveServer:
+    """Servidor de health check numa thread daemon; o app e o servidor são montados dentro dela."""
+    def __init__(self, port: int, is_ready=None, metrics=None):
+        self.port = port
+        self._is_ready = is_ready
+        self._metrics = metrics
+        self._server = None
+        self.started = Event() # Sinaliza que o servidor subiu (ou que falhou ao subir)
+        self._thread = Thread(target=self._serve, name="keep-alive", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        try:
+            from werkzeug.serving import make_server
+            self._server = make_server('0.0.0.0', self.port, create_app(self._is_ready, self._metrics), threaded=True)
+        except Exception as e:
+            logger.error("Servidor de health check não iniciou na porta %s: %s", self.port, e)
+            return
+        finally:
+            self.started.set()
+        self._server.serve_forever()
+
+    def shutdown(self, timeout: float = 5.0):
+        if self.started.wait(timeout) and self._server is not None:
+            self._server.shutdown()
+
+def keep_alive(port=8080, is_ready=None, metrics=None):
+    """Sobe o servidor de health check sem bloquear o bot. Retorna o servidor (use `.shutdown()` para pará-lo)."""
+    return KeepAliveServer(port, is_ready, metrics).start()
@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+import logging
+import signal
+import threading
+import time
+
+import inflight
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """
+    Inicia e encerra o bot sem perder respostas em andamento.
+
+    Ao receber SIGTERM/SIGINT: marca a instância como não pronta (/ready responde 503),
+    para de buscar updates (o offset já lido é confirmado ao Telegram, então a nova
+    instância continua de onde esta parou), espera os updates e chamadas à IA em
+    andamento até `drain_timeout` segundos e só então encerra a aplicação.
+    """
+    def __init__(self, drain_timeout: float = 25.0, cancel_grace: float = 5.0):
+        self.drain_timeout = drain_timeout
+        self.cancel_grace = cancel_grace # Espera extra depois de cancelar as chamadas pendentes
+        # Lido pela thread do servidor HTTP, por isso um Event e não um bool
+        self._ready = threading.Event()
+        self._stop: asyncio.Event | None = None
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def request_stop(self, reason: str = "pedido") -> None:
+        if self._stop is not None and not self._stop.is_set():
+            logger.info("Encerramento solicitado (%s).", reason)
+            self._ready.clear()
+            self._stop.set()
+
+    def _install_signal_handlers(self, loop: asyncio.AbstractEventLoop) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop, sig.name)
+            except (NotImplementedError, RuntimeError):
+                # Windows ou fora da thread principal: fica só o KeyboardInterrupt padrão
+                pass
+
+    async def run(self, *applications) -> None:
+        """Equivalente a `application.run_polling()` para uma ou mais aplicações, com drenagem no encerramento."""
+        self._stop = asyncio.Event()
+        self._install_signal_handlers(asyncio.get_running_loop())
+
+        async with contextlib.AsyncExitStack() as stack:
+            # Inicializa todas (o getMe valida cada token) antes de qualquer uma começar a receber updates
+            for application in applications:
+                await stack.enter_async_context(application)
+                if application.post_init:
+                    await application.post_init(application)
+            await self._start(applications)
+            self._ready.set()
+            logger.info("Bot pronto para receber updates.")
+
+            await self._stop.wait()
+            await self._drain(applications)
+
+            for application in applications:
+                if application.post_stop:
+                    await application.post_stop(application)
+        for application in applications:
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+        logger.info("Bot encerrado.")
+
+    async def _start(self, applications) -> None:
+        """Inicia o polling de todas; se uma falhar, para as que já iniciaram antes de propagar o erro."""
+        started = []
+        try:
+            for application in applications:
+                started.append(application)
+                await application.updater.start_polling()
+                await application.start()
+        except BaseException:
+            for application in reversed(started):
+                try:
+                    if application.updater.running:
+                        await application.updater.stop()
+                    if application.running:
+                        await application.stop()
+                except Exception as e:
+                    logger.error("Erro ao parar uma aplicação após falha na inicialização: %s", e)
+            raise
+
+    async def _drain(self, applications) -> None:
+        started = time.monotonic()
+        # 1. Nenhum update novo: encerra o long polling e confirma o offset já processado
+        await asyncio.gather(*(application.updater.stop() for application in applications))
+
+        # 2. application.stop() processa o que já está na fila e espera as tarefas de create_task
+        stopping = asyncio.ensure_future(asyncio.gather(*(application.stop() for application in applications)))
+        done, _ = await asyncio.wait({stopping}, timeout=self.drain_timeout)
+        if not done:
+            # 3. Prazo esgotado: as chamadas à IA pendentes terminam com StaleTurn
+            cancelled = inflight.registry.cancel_all()
+            logger.warning("Prazo de drenagem de %gs esgotado; %d chamada(s) à IA cancelada(s).",
+                           self.drain_timeout, cancelled)
+            done, _ = await asyncio.wait({stopping}, timeout=self.cancel_grace)
+            if not done:
+                logger.error("Aplicação não parou %gs após o cancelamento; encerrando assim mesmo.", self.cancel_grace)
+                stopping.add_done_callback(lambda future: future.cancelled() or future.exception())
+                stopping.cancel()
+        logger.info("Drenagem concluída em %.1fs.", time.monotonic() - started)
@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+import trade_stats
+from config import get_config
+
+VACUUM_PAGES = 2000 # Páginas liberadas por execução do vacuum incremental
+
+# Colunas de cada tabela arquivada. As colunas de texto longo são gravadas comprimidas.
+ARCHIVED_TABLES = {
+    'interactions': {
+        'key': 'interaction_id',
+        'columns': ['interaction_id', 'user_id', 'command', 'user_message', 'ai_response', 'timestamp', 'tokens_in', 'tokens_out', 'update_id'],
+        'compressed': ['user_message', 'ai_response'],
+        'counter': 'interactions',
+    },
+    'trades': {
+        'key': 'trade_id',
+        'columns': ['trade_id', 'user_id', 'trade_description', 'emotion', 'unplanned_actions', 'ai_analysis', 'timestamp', 'update_id'],
+        'compressed': ['trade_description', 'unplanned_actions', 'ai_analysis'],
+        'counter': 'trades',
+    },
+}
+
+
+def compress_text(text):
+    """Comprime um texto para o arquivo (zlib, nível máximo)."""
+    if text is None:
+        return None
+    return zlib.compress(text.encode('utf-8'), 9)
+
+def decompress_text(blob):
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+def connect(db_file: str | None = None) -> sqlite3.Connection:
+    db_file = db_file or get_config().db_file
+    conn = sqlite3.connect(db_file)
+    conn.create_function('compress_text', 1, compress_text, deterministic=True)
+    conn.create_function('decompress_text', 1, decompress_text, deterministic=True)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archived_counters (
+        user_id INTEGER PRIMARY KEY,
+        interactions INTEGER DEFAULT 0,
+        trades INTEGER DEFAULT 0
+    )
+    """)
+    return conn
+
+def archive_path(year: str, archive_dir: str | None = None) -> str:
+    archive_dir = archive_dir or get_config().archive_dir
+    return os.path.join(archive_dir, f"trader_bot_{year}.db")
+
+def _archive_column(col: str, spec: dict) -> str:
+    if col == spec['key']:
+        return f"{col} INTEGER PRIMARY KEY"
+    if col in spec['compressed']:
+        return f"{col} BLOB"
+    return col
+
+def _attach_archive(conn: sqlite3.Connection, year: str, archive_dir: str):
+    """Anexa o arquivo anual como 'arc' e garante que as tabelas existam."""
+    os.makedirs(archive_dir, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS arc", (archive_path(year, archive_dir),))
+    for table, spec in ARCHIVED_TABLES.items():
+        columns = ", ".join(_archive_column(col, spec) for col in spec['columns'])
+        conn.execute(f"CREATE TABLE IF NOT EXISTS arc.{table} ({columns})")
+        existing = {row[1] for row in conn.execute(f"PRAGMA arc.table_info({table})")}
+        for col in spec['columns']:
+            if col not in existing: # Arquivos criados antes de novas colunas
+                conn.execute(f"ALTER TABLE arc.{table} ADD COLUMN {_archive_column(col, spec)}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS arc.idx_{table}_user ON {table} (user_id)")
+
+def _archived_years(archive_dir: str) -> list[str]:
+    if not os.path.isdir(archive_dir):
+        return []
+    years = []
+    for name in sorted(os.listdir(archive_dir)):
+        if name.startswith("trader_bot_") and name.endswith(".db"):
+            years.append(name[len("trader_bot_"):-len(".db")])
+    return years
+
+def _archived_trades(conn: sqlite3.Connection, user_ids, archive_dir: str) -> dict[int, list[tuple]]:
+    """Trades arquivados de cada usuário, descomprimidos, no formato de trade_stats.rebuild."""
+    found = {user_id: [] for user_id in user_ids}
+    for year in _archived_years(archive_dir):
+        _attach_archive(conn, year, archive_dir)
+        for user_id, rows in found.items():
+            # Descomprime aqui: a conexão pode não ter as funções de connect() registradas (ex: transfer.py)
+            rows.extend(
+                (emotion, decompress_text(actions), timestamp) for emotion, actions, timestamp in conn.execute(
+                    "SELECT emotion, unplanned_actions, timestamp FROM arc.trades WHERE user_id = ?", (user_id,)
+                )
+            )
+        conn.execute("DETACH DATABASE arc")
+    return found
+
+def rebuild_stats(conn: sqlite3.Connection, user_ids, archive_dir: str | None = None):
+    """
+    Recalcula user_stats somando os trades já arquivados, que o recálculo do bot não enxerga.
+    Deve ser chamado fora de uma transação (ATTACH não é permitido dentro de uma).
+    """
+    archive_dir = archive_dir or get_config().archive_dir
+    conn.execute(trade_stats.CREATE_TABLE_SQL)
+    for user_id, archived in _archived_trades(conn, user_ids, archive_dir).items():
+        with conn:
+            trade_stats.rebuild(conn.cursor(), user_id, archived)
+
+def archive_old_rows(db_file: str | None = None, archive_dir: str | None = None, days: int | None = None) -> dict:
+    """
+    Move interações e trades mais antigos que `days` para os arquivos anuais comprimidos.
+    Os totais por usuário continuam disponíveis em `archived_counters`.
+    """
+    config = get_config()
+    archive_dir = archive_dir or config.archive_dir
+    days = config.retention_days if days is None else days
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    conn = connect(db_file)
+    moved = {table: 0 for table in ARCHIVED_TABLES}
+    try:
+        # Materializa as estatísticas antes de tirar os trades das tabelas principais:
+        # depois disso, um recálculo a partir delas perderia os trades arquivados
+        conn.execute(trade_stats.CREATE_TABLE_SQL)
+        affected = {row[0] for row in conn.execute("""
+            SELECT user_id FROM trades WHERE timestamp < ?
+            UNION
+            SELECT user_id FROM archived_counters WHERE trades > 0
+        """, (cutoff,))}
+        rebuild_stats(conn, trade_stats.outdated(conn.cursor(), sorted(affected)), archive_dir)
+
+        years = [row[0] for row in conn.execute("""
+            SELECT substr(timestamp, 1, 4) FROM interactions WHERE timestamp < ?
+            UNION
+            SELECT substr(timestamp, 1, 4) FROM trades WHERE timestamp < ?
+        """, (cutoff, cutoff))]
+
+        for year in years:
+            _attach_archive(conn, year, archive_dir)
+            with conn: # Cópia, contadores e remoção na mesma transação
+                for table, spec in ARCHIVED_TABLES.items():
+                    where = "timestamp < ? AND substr(timestamp, 1, 4) = ?"
+                    select_columns = ", ".join(
+                        f"compress_text({col})" if col in spec['compressed'] else col for col in spec['columns']
+                    )
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO arc.{table} ({', '.join(spec['columns'])}) "
+                        f"SELECT {select_columns} FROM main.{table} WHERE {where}",
+                        (cutoff, year)
+                    )
+                    counter = spec['counter']
+                    conn.execute(f"""
+                        INSERT INTO archived_counters (user_id, {counter})
+                        SELECT user_id, COUNT(*) FROM main.{table} WHERE {where} GROUP BY user_id
+                        ON CONFLICT(user_id) DO UPDATE SET {counter} = {counter} + excluded.{counter}
+                    """, (cutoff, year))
+                    cursor = conn.execute(f"DELETE FROM main.{table} WHERE {where}", (cutoff, year))
+                    moved[table] += cursor.rowcount
+            conn.execute("DETACH DATABASE arc")
+    finally:
+        conn.close()
+    return moved
+
+def incremental_vacuum(db_file: str | None = None, pages: int = VACUUM_PAGES) -> int:
+    """
+    Devolve ao sistema de arquivos até `pages` páginas livres.
+    Bancos criados antes do modo incremental passam por um VACUUM completo uma única vez.
+    """
+    conn = sqlite3.connect(db_file or get_config().db_file)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});") # executescript executa todos os passos
+        free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    return free_before - free_after
+
+def export_user(user_id: int, out_path: str, db_file: str | None = None, archive_dir: str | None = None) -> dict:
+    """Exporta para JSON todos os dados de um usuário, incluindo os registros arquivados."""
+    archive_dir = archive_dir or get_config().archive_dir
+    conn = connect(db_file)
+    conn.row_factory = sqlite3.Row
+    data = {'user_id': user_id, 'exported_at': datetime.now().isoformat()}
+    try:
+        for table in ('users', 'user_profiles', 'daily_plans', 'archived_counters'):
+            data[table] = [dict(row) for row in conn.execute(f"SELECT * FROM {table} WHERE user_id = ?", (user_id,))]
+        for table in ARCHIVED_TABLES:
+            data[table] = [dict(row) for row in conn.execute(f"SELECT * FROM {table} WHERE user_id = ?", (user_id,))]
+        for year in _archived_years(archive_dir):
+            _attach_archive(conn, year, archive_dir)
+            for table, spec in ARCHIVED_TABLES.items():
+                select_columns = ", ".join(
+                    f"decompress_text({col}) AS {col}" if col in spec['compressed'] else col for col in spec['columns']
+                )
+                data[table].extend(
+                    dict(row) for row in conn.execute(f"SELECT {select_columns} FROM arc.{table} WHERE user_id = ?", (user_id,))
+                )
+            conn.execute("DETACH DATABASE arc")
+    finally:
+        conn.close()
+
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return {table: len(rows) for table, rows in data.items() if isinstance(rows, list)}
+
+def restore_user(user_id: int, db_file: str | None = None, archive_dir: str | None = None) -> dict:
+    """Traz de volta para as tabelas principais os registros arquivados de um usuário."""
+    archive_dir = archive_dir or get_config().archive_dir
+    conn = connect(db_file)
+    restored = {table: 0 for table in ARCHIVED_TABLES}
+    try:
+        for year in _archived_years(archive_dir):
+            _attach_archive(conn, year, archive_dir)
+            with conn:
+                for table, spec in ARCHIVED_TABLES.items():
+                    select_columns = ", ".join(
+                        f"decompress_text({col})" if col in spec['compressed'] else col for col in spec['columns']
+                    )
+                    cursor = conn.execute(
+                        f"INSERT OR IGNORE INTO main.{table} ({', '.join(spec['columns'])}) "
+                        f"SELECT {select_columns} FROM arc.{table} WHERE user_id = ?",
+                        (user_id,)
+                    )
+                    conn.execute(f"DELETE FROM arc.{table} WHERE user_id = ?", (user_id,))
+                    counter = spec['counter']
+                    conn.execute(
+                        f"UPDATE archived_counters SET {counter} = MAX({counter} - ?, 0) WHERE user_id = ?",
+                        (cursor.rowcount, user_id)
+                    )
+                    restored[table] += cursor.rowcount
+            conn.execute("DETACH DATABASE arc")
+        rebuild_stats(conn, [user_id], archive_dir)
+    finally:
+        conn.close()
+    return restored
+
+def main():
+    parser = argparse.ArgumentParser(description="Retenção, arquivamento e compactação do banco do Mentor Bot.")
+    config = get_config()
+    parser.add_argument("--db", default=config.db_file, help="Arquivo do banco de dados principal (padrão: DB_FILE).")
+    parser.add_argument("--archive-dir", default=config.archive_dir, help="Pasta dos arquivos anuais (padrão: ARCHIVE_DIR).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("archive", help="Arquiva registros antigos e executa o vacuum incremental.")
+    archive_parser.add_argument("--days", type=int, default=config.retention_days,
+                                help="Idade mínima (em dias) dos registros arquivados (padrão: RETENTION_DAYS).")
+    archive_parser.add_argument("--vacuum-pages", type=int, default=VACUUM_PAGES)
+
+    vacuum_parser = subparsers.add_parser("vacuum", help="Executa apenas o vacuum incremental.")
+    vacuum_parser.add_argument("--pages", type=int, default=VACUUM_PAGES)
+
+    export_parser = subparsers.add_parser("export", help="Exporta todos os dados de um usuário para JSON.")
+    export_parser.add_argument("user_id", type=int)
+    export_parser.add_argument("--out", help="Arquivo de saída (padrão: user_<id>.json).")
+
+    restore_parser = subparsers.add_parser("restore", help="Restaura os registros arquivados de um usuário.")
+    restore_parser.add_argument("user_id", type=int)
+
+    args = parser.parse_args()
+    try:
+        if args.command == "archive":
+            moved = archive_old_rows(args.db, args.archive_dir, args.days)
+            print(f"[+] Registros arquivados: {moved}")
+            print(f"[+] Páginas liberadas: {incremental_vacuum(args.db, args.vacuum_pages)}")
+        elif args.command == "vacuum":
+            print(f"[+] Páginas liberadas: {incremental_vacuum(args.db, args.pages)}")
+        elif args.command == "export":
+            out_path = args.out or f"user_{args.user_id}.json"
+            counts = export_user(args.user_id, out_path, args.db, args.archive_dir)
+            print(f"[+] Dados do usuário {args.user_id} exportados para '{out_path}': {counts}")
+        elif args.command == "restore":
+            restored = restore_user(args.user_id, args.db, args.archive_dir)
+            print(f"[+] Registros restaurados para o usuário {args.user_id}: {restored}")
+    except sqlite3.OperationalError as e:
+        print(f"\nERRO: Não foi possível aceder à base de dados '{args.db}'.")
+        print(f"Detalhe: {e}")
+
+if __name__ == "__main__":
+    main()
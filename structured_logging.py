@@ -0,0 +1,133 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from datetime import datetime, timezone
+
+# Contexto do update em processamento (comunidade, user_id, handler), anexado a cada registro de log
+log_context = contextvars.ContextVar('log_context', default={})
+
+# Marca linhas de alto volume, que passam pela amostragem: logger.info(..., extra=HIGH_VOLUME)
+HIGH_VOLUME = {'sample': True}
+CONTEXT_FIELDS = ('tenant', 'user_id', 'handler', 'state', 'duration_ms')
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class ContextFilter(logging.Filter):
+    """Copia o contexto do update para o registro, ainda na thread de quem logou."""
+    def filter(self, record):
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Deixa passar só uma fração das linhas INFO de alto volume; avisos e erros passam sempre."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not getattr(record, 'sample', False):
+            return True
+        return random.random() < self.rate
+
+# Argumentos que podem ser formatados depois, na thread do listener, sem risco de mudarem até lá
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enfileira o registro sem formatá-lo: a mensagem (e os argumentos) só são
+    processados pela thread do QueueListener. Se algum argumento for mutável
+    (ex: um dict de métricas que o loop continua atualizando), a mensagem é
+    formatada aqui, com os valores do momento do log.
+    """
+    def prepare(self, record):
+        args = record.args
+        # Um único dict passado como argumento vira o próprio record.args (formatação por chave):
+        # ele é o objeto do chamador, mutável, então é formatado aqui
+        if args and (isinstance(args, dict) or not all(isinstance(value, _IMMUTABLE_ARGS) for value in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", sample_rate: float = 1.0) -> logging.handlers.QueueListener:
+    """
+    Substitui os handlers da raiz por uma fila: no caminho quente, logar custa um `put`.
+    A formatação JSON e a escrita em stderr acontecem numa thread em segundo plano.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # Cada getUpdates gera uma linha INFO do httpx
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Esvazia a fila e encerra a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def instrument(handler_function):
+    """Registra user_id, nome do handler, estado retornado e duração de cada update tratado."""
+    logger = logging.getLogger(handler_function.__module__)
+
+    @functools.wraps(handler_function)
+    async def wrapper(update, context):
+        user = getattr(update, 'effective_user', None)
+        token = log_context.set({**log_context.get(), 'user_id': user.id if user else None, 'handler': handler_function.__name__})
+        started = time.perf_counter()
+        state = None
+        try:
+            state = await handler_function(update, context)
+            return state
+        finally:
+            logger.info("Handler concluído", extra={
+                **HIGH_VOLUME, 'state': state,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+            log_context.reset(token)
+    return wrapper
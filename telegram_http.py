@@ -0,0 +1,54 @@
+import importlib.util
+import logging
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+def _http_version(requested: str) -> str:
+    """HTTP/2 depende do pacote opcional `h2` (python-telegram-bot[http2]); sem ele, fica em HTTP/1.1."""
+    if requested in ("2", "2.0") and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP_VERSION=2 requer python-telegram-bot[http2]; usando HTTP/1.1.")
+        return "1.1"
+    return requested
+
+def build_request(pool_size: int, keepalive_connections: int | None, keepalive_expiry: float, http_version: str,
+                  connect_timeout: float, read_timeout: float, write_timeout: float, pool_timeout: float):
+    """Um cliente HTTPX com pool próprio para a Bot API (`keepalive_connections=None` mantém o pool inteiro vivo)."""
+    import httpx
+    from telegram.request import HTTPXRequest
+
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        write_timeout=write_timeout,
+        pool_timeout=pool_timeout,
+        http_version=_http_version(http_version),
+        # Substitui os limites que o HTTPXRequest monta a partir de connection_pool_size
+        httpx_kwargs={'limits': httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size if keepalive_connections is None else min(keepalive_connections, pool_size),
+            keepalive_expiry=keepalive_expiry,
+        )},
+    )
+
+def outbound_request():
+    """Pool das chamadas de envio (reply_text, send_message...), dimensionado para rajadas."""
+    config = get_config()
+    return build_request(
+        config.http_pool_size, config.http_keepalive_connections, config.http_keepalive_expiry, config.http_version,
+        config.http_connect_timeout, config.http_read_timeout, config.http_write_timeout, config.http_pool_timeout,
+    )
+
+def updates_request():
+    """
+    Pool do getUpdates: uma única conexão, sempre ocupada pelo long polling
+    (a mesma separação que o ApplicationBuilder já faz, agora com timeouts e HTTP configuráveis).
+    """
+    config = get_config()
+    return build_request(
+        1, 1, config.http_keepalive_expiry, config.http_version,
+        config.http_connect_timeout, config.http_read_timeout, config.http_write_timeout, config.http_pool_timeout,
+    )
@@ -0,0 +1,149 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field, asdict
+from datetime import date
+
+from config import get_config
+from structured_logging import log_context
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """Uma comunidade atendida pelo processo: token, link e banco próprios."""
+    name: str
+    telegram_token: str | None
+    community_link: str
+    db_file: str
+    max_interactions_per_day: int # Por usuário
+    max_ai_calls_per_day: int | None = None # Para a comunidade inteira (None = sem limite)
+
+
+@dataclass
+class TenantMetrics:
+    updates: int = 0
+    ai_calls: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    quota_rejections: int = 0
+    ai_calls_today: int = 0
+    day: str = field(default_factory=lambda: date.today().isoformat())
+
+    def roll_day(self):
+        today = date.today().isoformat()
+        if self.day != today:
+            self.day = today
+            self.ai_calls_today = 0
+
+
+# Comunidade do update em processamento; fora de um handler vale a comunidade padrão (.env)
+current_tenant: contextvars.ContextVar[Tenant | None] = contextvars.ContextVar('current_tenant', default=None)
+_metrics: dict[str, TenantMetrics] = {}
+_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def default_tenant() -> Tenant:
+    config = get_config()
+    return Tenant(
+        name="default",
+        telegram_token=config.telegram_token,
+        community_link=config.community_link,
+        db_file=config.db_file,
+        max_interactions_per_day=config.max_interactions_per_day,
+    )
+
+def active() -> Tenant:
+    return current_tenant.get() or default_tenant()
+
+def load_tenants(path: str) -> list[Tenant]:
+    """
+    Lê o arquivo de comunidades: uma lista JSON de objetos com `name` e `telegram_token`
+    (ou `telegram_token_env`, o nome da variável de ambiente com o token).
+    Os demais campos, se omitidos, vêm do .env.
+    """
+    config = get_config()
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    loaded = []
+    for entry in entries:
+        token = entry.get('telegram_token') or os.getenv(entry.get('telegram_token_env', ''))
+        loaded.append(Tenant(
+            name=entry['name'],
+            telegram_token=token,
+            community_link=entry.get('community_link', config.community_link),
+            db_file=entry.get('db_file', f"{entry['name']}.db"),
+            max_interactions_per_day=int(entry.get('max_interactions_per_day', config.max_interactions_per_day)),
+            max_ai_calls_per_day=int(entry['max_ai_calls_per_day']) if entry.get('max_ai_calls_per_day') is not None else None,
+        ))
+    names = [tenant.name for tenant in loaded]
+    duplicated = {name for name in names if names.count(name) > 1}
+    if duplicated:
+        raise ValueError(f"Comunidades repetidas em {path}: {', '.join(sorted(duplicated))}")
+    db_files = [os.path.abspath(tenant.db_file) for tenant in loaded]
+    if len(set(db_files)) != len(db_files):
+        raise ValueError(f"Duas comunidades em {path} usam o mesmo banco de dados.")
+    return loaded
+
+@contextlib.contextmanager
+def using(tenant: Tenant):
+    """Torna `tenant` a comunidade ativa dentro do bloco (ex: para inicializar o banco dela)."""
+    tenant_token = current_tenant.set(tenant)
+    log_token = log_context.set({**log_context.get(), 'tenant': tenant.name})
+    try:
+        yield tenant
+    finally:
+        log_context.reset(log_token)
+        current_tenant.reset(tenant_token)
+
+def scoped(tenant: Tenant, handler_function):
+    """Executa o handler (e as tarefas que ele criar) no contexto da comunidade."""
+    @functools.wraps(handler_function)
+    async def wrapper(update, context):
+        metrics(tenant.name).updates += 1
+        with using(tenant):
+            return await handler_function(update, context)
+    return wrapper
+
+
+def metrics(name: str | None = None) -> TenantMetrics:
+    name = name or active().name
+    entry = _metrics.get(name)
+    if entry is None:
+        with _lock:
+            entry = _metrics.setdefault(name, TenantMetrics())
+    return entry
+
+def seed_daily_calls(count: int):
+    """Retoma a contagem do dia (lida do banco) ao iniciar, para a cota não zerar a cada reinício."""
+    entry = metrics()
+    entry.roll_day()
+    entry.ai_calls_today = max(entry.ai_calls_today, count)
+
+def quota_exceeded() -> bool:
+    """True se a comunidade ativa já usou todas as chamadas à IA do dia."""
+    tenant = active()
+    if tenant.max_ai_calls_per_day is None:
+        return False
+    entry = metrics(tenant.name)
+    entry.roll_day()
+    if entry.ai_calls_today >= tenant.max_ai_calls_per_day:
+        entry.quota_rejections += 1
+        return True
+    return False
+
+def record_ai_call(tokens_in: int | None, tokens_out: int | None):
+    entry = metrics()
+    entry.roll_day()
+    entry.ai_calls += 1
+    entry.ai_calls_today += 1
+    entry.tokens_in += tokens_in or 0
+    entry.tokens_out += tokens_out or 0
+
+def snapshot() -> dict[str, dict]:
+    return {name: asdict(entry) for name, entry in _metrics.items()}
@@ -0,0 +1,106 @@
+import re
+
+# Aproximação local do tokenizer: palavras longas viram vários tokens, cada pontuação conta como um
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_TOKEN = 5
+ELLIPSIS = " [...] "
+
+# Orçamento de tokens de entrada por modo (prompt completo)
+MODE_BUDGETS = {
+    'diagnose': 1500,
+    'improve': 900,
+    'affirmation': 600,
+}
+DEFAULT_BUDGET = 1200
+
+# Teto de cada seção, independentemente do orçamento restante
+SECTION_CAPS = {
+    'goal': 80,
+    'fear': 80,
+    'inconsistency_reason': 150,
+    'emotion': 40,
+    'todays_plan': 400,
+    'description': 500,
+    'actions': 250,
+    'user_input': 700,
+}
+
+# Ordem de corte quando o prompt estoura o orçamento: as menores prioridades são reduzidas primeiro
+SECTION_PRIORITIES = {
+    'inconsistency_reason': 1,
+    'goal': 2,
+    'fear': 3,
+    'todays_plan': 4,
+    'actions': 5,
+    'description': 6,
+    'emotion': 7,
+    'user_input': 8,
+}
+MIN_SECTION_TOKENS = 20 # Nenhuma seção é reduzida abaixo disso
+
+
+def _piece_tokens(piece: str) -> int:
+    return 1 + (len(piece) - 1) // CHARS_PER_TOKEN
+
+def estimate_tokens(text: str | None) -> int:
+    """Estimativa rápida do número de tokens de um texto."""
+    if not text:
+        return 0
+    return sum(_piece_tokens(match.group()) for match in _TOKEN_PATTERN.finditer(text))
+
+def _cut_position(text: str, max_tokens: int) -> int:
+    """Posição (em caracteres) onde o texto atinge `max_tokens`."""
+    total = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        total += _piece_tokens(match.group())
+        if total > max_tokens:
+            return match.start()
+    return len(text)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Reduz o texto a `max_tokens`, preservando o início e o final (onde costuma estar a conclusão)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    head_tokens = max(max_tokens * 2 // 3, 1)
+    tail_tokens = max(max_tokens - head_tokens, 0)
+    head = text[:_cut_position(text, head_tokens)].rstrip()
+    reversed_tail = text[::-1]
+    tail = text[len(text) - _cut_position(reversed_tail, tail_tokens):].lstrip() if tail_tokens else ""
+    return f"{head}{ELLIPSIS}{tail}".rstrip()
+
+def fit_sections(sections: dict[str, str | None], mode: str, reserved_tokens: int = 0) -> tuple[dict[str, str | None], int]:
+    """
+    Aplica os tetos por seção e, se o total ainda passar do orçamento do modo,
+    reduz as seções por ordem de prioridade.
+    `reserved_tokens` é a parte fixa do prompt (instruções do sistema e da tarefa).
+    Retorna as seções ajustadas e a estimativa de tokens do prompt completo.
+    """
+    fitted = {}
+    tokens = {}
+    for name, text in sections.items():
+        if text is None:
+            fitted[name] = None
+            tokens[name] = 0
+            continue
+        text = str(text)
+        cap = SECTION_CAPS.get(name)
+        if cap is not None:
+            text = truncate_to_tokens(text, cap)
+        fitted[name] = text
+        tokens[name] = estimate_tokens(text)
+
+    budget = MODE_BUDGETS.get(mode, DEFAULT_BUDGET)
+    excess = reserved_tokens + sum(tokens.values()) - budget
+    for name in sorted(fitted, key=lambda n: SECTION_PRIORITIES.get(n, 0)):
+        if excess <= 0:
+            break
+        available = tokens[name] - MIN_SECTION_TOKENS
+        if available <= 0:
+            continue
+        target = tokens[name] - min(available, excess)
+        fitted[name] = truncate_to_tokens(fitted[name], target)
+        new_tokens = estimate_tokens(fitted[name])
+        excess -= tokens[name] - new_tokens
+        tokens[name] = new_tokens
+
+    return fitted, reserved_tokens + sum(tokens.values())
@@ -0,0 +1,217 @@
+import itertools
+import json
+import re
+import sqlite3
+import unicodedata
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from intents import has_unplanned_actions
+
+WEEKS_KEPT = 8 # Semanas mantidas na série de aderência
+MAX_EMOTION_WORDS = 3
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Estatísticas materializadas por usuário, atualizadas a cada /postrade e /pretrade
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_trades INTEGER DEFAULT 0,
+    unplanned_trades INTEGER DEFAULT 0,
+    emotions TEXT DEFAULT '{}',
+    weekly TEXT DEFAULT '{}',
+    plan_days INTEGER DEFAULT 0,
+    plan_streak INTEGER DEFAULT 0,
+    best_plan_streak INTEGER DEFAULT 0,
+    last_plan_date TEXT,
+    updated_at TEXT
+)
+"""
+
+
+def _words(text: str | None) -> list[str]:
+    if not text:
+        return []
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return _WORD_PATTERN.findall(normalized)
+
+def normalize_emotion(text: str | None) -> str:
+    """Chave da emoção: minúsculas, sem acentos e limitada às primeiras palavras."""
+    return " ".join(_words(text)[:MAX_EMOTION_WORDS]) or "?"
+
+# Cada semana guarda [operações, com ações fora do plano, dias com plano, operações aderentes].
+# Aderente = feita num dia com plano definido e sem ações fora dele.
+WEEK_FIELDS = 4
+
+def week_key(timestamp: str) -> str:
+    year, week, _ = datetime.fromisoformat(timestamp).isocalendar()
+    return f"{year}-S{week:02d}"
+
+def _empty_row(user_id: int) -> dict:
+    return {
+        'user_id': user_id, 'total_trades': 0, 'unplanned_trades': 0,
+        'emotions': {}, 'weekly': {},
+        'plan_days': 0, 'plan_streak': 0, 'best_plan_streak': 0, 'last_plan_date': None,
+    }
+
+def _read(cursor: sqlite3.Cursor, user_id: int) -> dict | None:
+    cursor.execute("""
+        SELECT total_trades, unplanned_trades, emotions, weekly, plan_days, plan_streak, best_plan_streak, last_plan_date
+        FROM user_stats WHERE user_id = ?
+    """, (user_id,))
+    result = cursor.fetchone()
+    if result is None:
+        return None
+    weekly = json.loads(result[3])
+    if any(len(counts) != WEEK_FIELDS for counts in weekly.values()):
+        return None # Formato anterior da série semanal: recalcula a partir do histórico
+    return {
+        'user_id': user_id, 'total_trades': result[0], 'unplanned_trades': result[1],
+        'emotions': json.loads(result[2]), 'weekly': weekly,
+        'plan_days': result[4], 'plan_streak': result[5], 'best_plan_streak': result[6], 'last_plan_date': result[7],
+    }
+
+def _write(cursor: sqlite3.Cursor, stats: dict):
+    weekly = dict(sorted(stats['weekly'].items())[-WEEKS_KEPT:])
+    cursor.execute("""
+    INSERT INTO user_stats (user_id, total_trades, unplanned_trades, emotions, weekly, plan_days, plan_streak, best_plan_streak, last_plan_date, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_trades=excluded.total_trades, unplanned_trades=excluded.unplanned_trades,
+        emotions=excluded.emotions, weekly=excluded.weekly, plan_days=excluded.plan_days,
+        plan_streak=excluded.plan_streak, best_plan_streak=excluded.best_plan_streak,
+        last_plan_date=excluded.last_plan_date, updated_at=excluded.updated_at
+    """, (
+        stats['user_id'], stats['total_trades'], stats['unplanned_trades'],
+        json.dumps(stats['emotions'], ensure_ascii=False), json.dumps(weekly),
+        stats['plan_days'], stats['plan_streak'], stats['best_plan_streak'], stats['last_plan_date'],
+        datetime.now().isoformat()
+    ))
+
+def _week(stats: dict, week: str) -> list[int]:
+    return stats['weekly'].setdefault(week, [0] * WEEK_FIELDS)
+
+def _add_trade(stats: dict, emotion: str, week: str, count: int, unplanned_count: int, adherent_count: int):
+    stats['total_trades'] += count
+    stats['unplanned_trades'] += unplanned_count
+    emotion_counts = stats['emotions'].setdefault(emotion, [0, 0])
+    emotion_counts[0] += count
+    emotion_counts[1] += unplanned_count
+    week_counts = _week(stats, week)
+    week_counts[0] += count
+    week_counts[1] += unplanned_count
+    week_counts[3] += adherent_count
+
+def _add_plan_day(stats: dict, plan_date: str) -> bool:
+    """Conta um novo dia com plano. Retorna False se o dia já tinha sido contado."""
+    last = stats['last_plan_date']
+    if last is not None and plan_date <= last:
+        return False # Plano do mesmo dia reescrito (ou fora de ordem): não conta de novo
+    stats['plan_days'] += 1
+    _week(stats, week_key(plan_date))[2] += 1
+    consecutive = last is not None and date.fromisoformat(plan_date) - date.fromisoformat(last) == timedelta(days=1)
+    stats['plan_streak'] = stats['plan_streak'] + 1 if consecutive else 1
+    stats['best_plan_streak'] = max(stats['best_plan_streak'], stats['plan_streak'])
+    stats['last_plan_date'] = plan_date
+    return True
+
+def _fetch_batches(cursor: sqlite3.Cursor):
+    while rows := cursor.fetchmany(500):
+        yield from rows
+
+def rebuild(cursor: sqlite3.Cursor, user_id: int, archived_trades=()) -> dict:
+    """
+    Recalcula as estatísticas de um usuário a partir do histórico (quando não existem ou estão desatualizadas).
+    `archived_trades` traz as linhas (emotion, unplanned_actions, timestamp) já movidas para os arquivos
+    anuais, que o bot não enxerga (ver retention.rebuild_stats).
+    """
+    stats = _empty_row(user_id)
+    cursor.execute("SELECT plan_date FROM daily_plans WHERE user_id = ? ORDER BY plan_date", (user_id,))
+    plan_dates = [plan_date for (plan_date,) in cursor.fetchall()]
+    for plan_date in plan_dates:
+        _add_plan_day(stats, plan_date)
+    planned_days = set(plan_dates)
+
+    cursor.execute("SELECT emotion, unplanned_actions, timestamp FROM trades WHERE user_id = ?", (user_id,))
+    totals = Counter()
+    unplanned = Counter()
+    adherent = Counter()
+    for emotion, actions, timestamp in itertools.chain(_fetch_batches(cursor), archived_trades):
+        key = (normalize_emotion(emotion), week_key(timestamp))
+        is_unplanned = has_unplanned_actions(actions)
+        totals[key] += 1
+        unplanned[key] += is_unplanned
+        adherent[key] += not is_unplanned and timestamp[:10] in planned_days
+    for key, count in totals.items():
+        _add_trade(stats, key[0], key[1], count, unplanned[key], adherent[key])
+    _write(cursor, stats)
+    return stats
+
+def _archived_users(cursor: sqlite3.Cursor, ids: list[int]) -> set[int]:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archived_counters'")
+    if cursor.fetchone() is None:
+        return set()
+    archived = set()
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(
+            f"SELECT user_id FROM archived_counters WHERE trades > 0 AND user_id IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+        archived.update(user_id for (user_id,) in cursor.fetchall())
+    return archived
+
+def invalidate(cursor: sqlite3.Cursor, user_ids) -> set[int]:
+    """
+    Descarta as estatísticas de usuários cujo histórico mudou por fora do bot (importação, restauração).
+    Elas são recalculadas na próxima leitura ou no próximo trade.
+    Usuários com trades arquivados mantêm as estatísticas, pois o recálculo do bot perderia esses trades;
+    retorna esses ids, a recalcular com retention.rebuild_stats.
+    """
+    ids = [user_id for user_id in user_ids if user_id is not None]
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'")
+    if not ids or cursor.fetchone() is None:
+        return set()
+    kept = _archived_users(cursor, ids)
+    ids = [user_id for user_id in ids if user_id not in kept]
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f"DELETE FROM user_stats WHERE user_id IN ({', '.join('?' for _ in chunk)})", chunk)
+    return kept
+
+def outdated(cursor: sqlite3.Cursor, user_ids) -> list[int]:
+    """Usuários sem estatísticas materializadas (ou no formato anterior)."""
+    return [user_id for user_id in user_ids if _read(cursor, user_id) is None]
+
+def record_trade(cursor: sqlite3.Cursor, user_id: int, emotion: str | None, actions: str | None, timestamp: str):
+    """Atualiza as estatísticas com um novo trade (chamado na mesma transação do INSERT)."""
+    stats = _read(cursor, user_id)
+    if stats is None:
+        rebuild(cursor, user_id) # O trade recém-inserido já entra no recálculo
+        return
+    is_unplanned = has_unplanned_actions(actions)
+    cursor.execute("SELECT 1 FROM daily_plans WHERE user_id = ? AND plan_date = ?", (user_id, timestamp[:10]))
+    planned_day = cursor.fetchone() is not None
+    _add_trade(stats, normalize_emotion(emotion), week_key(timestamp), 1, int(is_unplanned), int(planned_day and not is_unplanned))
+    _write(cursor, stats)
+
+def record_plan(cursor: sqlite3.Cursor, user_id: int, plan_date: str):
+    """Atualiza a sequência de planos diários (chamado na mesma transação do INSERT)."""
+    stats = _read(cursor, user_id)
+    if stats is None:
+        rebuild(cursor, user_id)
+        return
+    if _add_plan_day(stats, plan_date):
+        # Operações do dia registradas antes do plano passam a contar como aderentes, como no recálculo
+        cursor.execute("SELECT unplanned_actions FROM trades WHERE user_id = ? AND date(timestamp) = ?", (user_id, plan_date))
+        _week(stats, week_key(plan_date))[3] += sum(not has_unplanned_actions(actions) for (actions,) in cursor.fetchall())
+    _write(cursor, stats)
+
+def load(cursor: sqlite3.Cursor, user_id: int) -> dict:
+    """Estatísticas de um usuário, prontas para exibição."""
+    stats = _read(cursor, user_id) or rebuild(cursor, user_id)
+    last = stats['last_plan_date']
+    if last is None or date.today() - date.fromisoformat(last) > timedelta(days=1):
+        stats['plan_streak'] = 0 # A sequência foi interrompida
+    return stats
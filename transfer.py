@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import retention
+import trade_stats
+from config import get_config
+
+BATCH_SIZE = 1000 # Linhas por leitura (export) e por transação (import)
+
+# Ordem de exportação/importação e chave de cada tabela.
+# Tabelas com chave autoincremento podem receber novos ids no destino (--new-ids).
+TABLES = {
+    'users': {'key': ['user_id'], 'autoincrement': False},
+    'user_profiles': {'key': ['user_id'], 'autoincrement': False},
+    'daily_plans': {'key': ['user_id', 'plan_date'], 'autoincrement': False},
+    'archived_counters': {'key': ['user_id'], 'autoincrement': False},
+    'trades': {'key': ['trade_id'], 'autoincrement': True},
+    'interactions': {'key': ['interaction_id'], 'autoincrement': True},
+}
+# Tabelas que alimentam as estatísticas materializadas (user_stats)
+STATS_SOURCES = {'trades', 'daily_plans'}
+
+
+def _load_checkpoint(path: str) -> dict:
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def _save_checkpoint(path: str, state: dict):
+    # Grava num arquivo temporário e renomeia, para nunca deixar um checkpoint pela metade
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _iter_batches(conn: sqlite3.Connection, table: str, after_rowid: int, user_ids: list[int] | None, batch_size: int):
+    """
+    Percorre a tabela em lotes ordenados por rowid.
+    Cada lote é uma leitura curta e independente, então o bot continua gravando durante a exportação.
+    """
+    user_filter = ""
+    params: list = []
+    if user_ids:
+        user_filter = f" AND user_id IN ({', '.join('?' for _ in user_ids)})"
+        params = list(user_ids)
+    while True:
+        cursor = conn.execute(
+            f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ?{user_filter} ORDER BY rowid LIMIT ?",
+            [after_rowid, *params, batch_size]
+        )
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchmany(batch_size)
+        cursor.close()
+        if not rows:
+            return
+        after_rowid = rows[-1][0]
+        yield after_rowid, [dict(zip(columns[1:], row[1:])) for row in rows]
+
+def export_data(out_path: str, db_file: str | None = None, user_ids: list[int] | None = None,
+                batch_size: int = BATCH_SIZE, resume: bool = False) -> dict:
+    """Exporta as tabelas para NDJSON (uma linha por registro), retomável via checkpoint."""
+    checkpoint_path = f"{out_path}.ckpt"
+    state = _load_checkpoint(checkpoint_path) if resume else {}
+    conn = sqlite3.connect(db_file or get_config().db_file)
+    counts = {}
+    try:
+        with open(out_path, 'r+b' if resume and os.path.isfile(out_path) else 'wb') as out:
+            # Um lote gravado sem checkpoint (queda entre os dois passos) é descartado, não repetido.
+            # Checkpoints antigos, sem 'offset', continuam do fim do arquivo.
+            offset = state.get('offset', None if state else 0)
+            if offset is None:
+                out.seek(0, os.SEEK_END)
+            else:
+                out.truncate(offset)
+                out.seek(offset)
+            for table in TABLES:
+                after_rowid = state.get(table, 0)
+                counts[table] = 0
+                for after_rowid, rows in _iter_batches(conn, table, after_rowid, user_ids, batch_size):
+                    for row in rows:
+                        line = json.dumps({'table': table, 'row': row}, ensure_ascii=False, separators=(',', ':'))
+                        out.write(line.encode('utf-8') + b'\n')
+                    out.flush()
+                    os.fsync(out.fileno())
+                    counts[table] += len(rows)
+                    state[table] = after_rowid
+                    state['offset'] = out.tell()
+                    _save_checkpoint(checkpoint_path, state)
+                print(f"[+] {table}: {counts[table]} registros exportados")
+    finally:
+        conn.close()
+    if os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+    return counts
+
+def _insert_sql(table: str, columns: list[str]) -> str:
+    spec = TABLES[table]
+    placeholders = ", ".join("?" for _ in columns)
+    if spec['autoincrement']:
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    updates = ", ".join(f"{col}=excluded.{col}" for col in columns if col not in spec['key'])
+    conflict = "DO NOTHING" if not updates else f"DO UPDATE SET {updates}"
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT({', '.join(spec['key'])}) {conflict}"
+    )
+
+def import_data(in_path: str, db_file: str | None = None, batch_size: int = BATCH_SIZE,
+                resume: bool = False, new_ids: bool = False, archive_dir: str | None = None) -> dict:
+    """
+    Importa um arquivo NDJSON em transações de `batch_size` linhas.
+    O checkpoint guarda a última linha confirmada; com `resume` a importação continua dali.
+    """
+    checkpoint_path = f"{in_path}.ckpt"
+    state = _load_checkpoint(checkpoint_path) if resume else {}
+    skip_lines = state.get('line', 0)
+    conn = sqlite3.connect(db_file or get_config().db_file)
+    target_columns = {}
+    for table in TABLES:
+        target_columns[table] = set(_table_columns(conn, table))
+        if not target_columns[table]:
+            conn.close()
+            raise sqlite3.OperationalError(f"tabela '{table}' não existe no destino. Inicie o bot uma vez para criá-la.")
+
+    counts = {table: 0 for table in TABLES}
+    line_number = 0
+    pending = 0
+    stale_stats = set()
+    # Usuários com trades arquivados: recalculados com os arquivos anuais ao final
+    archived_stats = set(state.get('archived_stats', []))
+    try:
+        with open(in_path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if line_number <= skip_lines or not line.strip():
+                    continue
+                record = json.loads(line)
+                table, row = record['table'], record['row']
+                if table not in TABLES:
+                    continue
+                if new_ids and TABLES[table]['autoincrement']:
+                    row = {col: value for col, value in row.items() if col not in TABLES[table]['key']}
+                    # update_id é de outro bot: colidiria com os índices de idempotência do destino
+                    if 'update_id' in row:
+                        row['update_id'] = None
+                columns = [col for col in row if col in target_columns[table]]
+                cursor = conn.execute(_insert_sql(table, columns), [row[col] for col in columns])
+                # Registros ignorados (chave já existente no destino) não contam como importados
+                counts[table] += cursor.rowcount
+                if table in STATS_SOURCES:
+                    stale_stats.add(row.get('user_id'))
+                pending += 1
+                if pending >= batch_size:
+                    archived_stats |= trade_stats.invalidate(conn.cursor(), stale_stats)
+                    stale_stats.clear()
+                    conn.commit()
+                    _save_checkpoint(checkpoint_path, {'line': line_number, 'archived_stats': sorted(archived_stats)})
+                    pending = 0
+        archived_stats |= trade_stats.invalidate(conn.cursor(), stale_stats)
+        conn.commit()
+        if archived_stats:
+            retention.rebuild_stats(conn, sorted(archived_stats), archive_dir)
+    finally:
+        conn.close()
+    if os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportação e importação em massa dos dados dos usuários (NDJSON).")
+    parser.add_argument("--db", default=get_config().db_file, help="Arquivo do banco de dados (padrão: DB_FILE).")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--resume", action="store_true", help="Continua a partir do último checkpoint.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta os dados para um arquivo NDJSON.")
+    export_parser.add_argument("out", help="Arquivo de saída.")
+    export_parser.add_argument("--user", type=int, action="append", dest="user_ids", help="Exporta apenas este usuário (repetível).")
+
+    import_parser = subparsers.add_parser("import", help="Importa um arquivo NDJSON.")
+    import_parser.add_argument("input", help="Arquivo de entrada.")
+    import_parser.add_argument("--new-ids", action="store_true",
+                               help="Gera novos ids para trades e interações e descarta os update_id "
+                                    "(use ao importar dados de outra instância do bot).")
+    import_parser.add_argument("--archive-dir", default=get_config().archive_dir,
+                               help="Pasta dos arquivos anuais, para recalcular as estatísticas (padrão: ARCHIVE_DIR).")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "export":
+            counts = export_data(args.out, args.db, args.user_ids, args.batch_size, args.resume)
+            print(f"\n[+] Exportação concluída para '{args.out}': {sum(counts.values())} registros")
+        else:
+            counts = import_data(args.input, args.db, args.batch_size, args.resume, args.new_ids, args.archive_dir)
+            for table, count in counts.items():
+                print(f"[+] {table}: {count} registros importados")
+    except sqlite3.OperationalError as e:
+        print(f"\nERRO: Não foi possível aceder à base de dados '{args.db}'.")
+        print(f"Detalhe: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()